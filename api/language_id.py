@@ -0,0 +1,104 @@
+import math
+import re
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+# Compact character trigram profiles for the two supported languages, most
+# frequent first ("_" marks a word boundary). Rank decides the weight.
+_PROFILES = {
+    "en": (
+        "_th the he_ _an and nd_ ing ng_ _to _of of_ _in ed_ to_ er_ is_ _a_ "
+        "_is _it re_ at_ ion it_ you _yo ou_ hat tha _wh his thi for _fo _be "
+        "ent es_ ly_ ll_ _we we_ are _ar ave hav ve_ was wit ith th_ on_ "
+        "in_ _so _wi all ere her _do _ca n't 's_ _i_ ght ugh _ha"
+    ).split(),
+    "es": (
+        "_de de_ os_ _la la_ el_ _el que _qu ue_ es_ en_ _en as_ _co _lo "
+        "ón_ ión ció _se se_ _un do_ ado ar_ nte _es est sta ra_ _po por "
+        "or_ _pa par ara los las _y_ mos _ha _no no_ una ien ent _me _ve "
+        "nto _si ía_ _má más _pe per _cu _ti _pu _ll llo"
+    ).split(),
+}
+
+LANGUAGE_NAMES = {"en": "English", "es": "Spanish"}
+
+# Characters that only show up in Spanish text
+_SPANISH_CHARS = set("ñáéíóú¿¡ü")
+
+_WEIGHTS: Dict[str, Dict[str, float]] = {
+    lang: {gram.replace("_", " "): 1.0 / math.log2(rank + 2) for rank, gram in enumerate(grams)}
+    for lang, grams in _PROFILES.items()
+}
+
+# Matched trigrams (or Spanish-only characters) needed before a guess counts as sure
+MIN_EVIDENCE = 6
+
+_NON_LETTERS = re.compile(r"[^\w'\s]+|\d+")
+
+
+def normalize_language(language_code: Optional[str]) -> Optional[str]:
+    """Map a BCP-47 code like 'es-ES' or 'en-us' to 'es'/'en' (None if unsupported)."""
+    if not language_code:
+        return None
+    lang = language_code.split("-")[0].lower()
+    return lang if lang in _PROFILES else None
+
+
+def detect_language(text: str) -> Tuple[Optional[str], float]:
+    """Guess 'es' or 'en' from character trigrams.
+
+    Returns (language, confidence) with confidence in [0, 1]; language is None
+    when the text carries no signal at all. Confidence is the winner's margin
+    over the other language, scaled down when fewer than MIN_EVIDENCE trigrams
+    matched, so a short phrase hitting one or two trigrams never looks certain.
+    """
+    text = unicodedata.normalize("NFC", text.lower())
+    text = " " + " ".join(_NON_LETTERS.sub(" ", text).split()) + " "
+
+    scores = {lang: 0.0 for lang in _WEIGHTS}
+    evidence = 0
+    for i in range(len(text) - 2):
+        gram = text[i:i + 3]
+        matched = False
+        for lang, weights in _WEIGHTS.items():
+            if gram in weights:
+                scores[lang] += weights[gram]
+                matched = True
+        evidence += matched
+
+    # Accents and ñ are strong evidence on their own
+    spanish_chars = sum(1 for c in text if c in _SPANISH_CHARS)
+    scores["es"] += 2.0 * spanish_chars
+    evidence += spanish_chars
+
+    total = sum(scores.values())
+    if total == 0:
+        return None, 0.0
+    best, second = sorted(scores, key=scores.get, reverse=True)
+    margin = (scores[best] - scores[second]) / total
+    return best, margin * min(1.0, evidence / MIN_EVIDENCE)
+
+
+def translation_target(source_lang: Optional[str], target_lang: Optional[str] = None) -> Optional[str]:
+    """Language to translate into: the listener's choice, or the other one of ES/EN."""
+    if target_lang in _PROFILES:
+        return target_lang
+    if source_lang == "es":
+        return "en"
+    if source_lang == "en":
+        return "es"
+    return None
+
+
+def resolve_language(text: str, stt_language: Optional[str] = None, min_confidence: float = 0.4) -> Optional[str]:
+    """Pick the spoken language of an utterance.
+
+    The language Speech-to-Text recognized always wins. The local model is only
+    a fallback when STT gave nothing usable, and only if it has enough evidence;
+    otherwise None is returned and the translation prompt detects the language.
+    """
+    stt_lang = normalize_language(stt_language)
+    if stt_lang is not None:
+        return stt_lang
+    local_lang, confidence = detect_language(text)
+    return local_lang if confidence >= min_confidence else None
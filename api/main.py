@@ -3,11 +3,14 @@ import asyncio
 import json
 import logging
 import time
+from typing import Optional
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
-from services import Transcriber, MockTranscriber, SmartAssistant, UsageManager
+from services import Transcriber, MockTranscriber, SmartAssistant, SmartReplyManager, UsageManager, reply_stats
 from dotenv import load_dotenv
 from debug_utils import log_crash
+from session_manager import ResumableSession, session_registry
+from language_id import normalize_language, resolve_language, translation_target
 
 load_dotenv()
 
@@ -44,6 +47,12 @@ else:
     print("WARNING: GOOGLE_APPLICATION_CREDENTIALS not found. Using Mock Transcriber.")
     transcriber_class = MockTranscriber
 
+# Speaker context timeout for handling interruptions
+CONTEXT_TIMEOUT = 10  # seconds
+
+# Close codes that mean the client stopped on purpose (no resume expected)
+CLEAN_CLOSE_CODES = (1000, 1005)
+
 @app.get("/")
 def health_check():
     return {"status": "ok", "service": "LanguageBridge Endpoint"}
@@ -53,8 +62,163 @@ def cache_stats():
     from cache_manager import translation_cache
     return translation_cache.get_stats()
 
+@app.get("/sessions/stats")
+def sessions_stats():
+    return session_registry.get_stats()
+
+@app.get("/replies/stats")
+def replies_stats():
+    return reply_stats.get_stats()
+
+async def send_replies(session: ResumableSession, utterance_id: int):
+    """Generates (or reuses cached) smart replies for one utterance and sends them."""
+    try:
+        replies_res = await session.smart_replies.get_replies(utterance_id)
+        await session.send({
+            "type": "replies_only",
+            "utterance_id": utterance_id,
+            "replies": replies_res.get("replies", [])
+        })
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        print(f"Smart replies error: {e}", flush=True)
+
+async def process_transcription(session: ResumableSession):
+    """Runs the transcription pipeline for a session, independent of its WebSocket."""
+    user_id = session.user_id
+    speaker_context = session.speaker_context
+    current_translation_task = None
+    last_speaker = None
+
+    async def audio_generator():
+        """Yields audio chunks from the queue."""
+        while True:
+            chunk = await session.audio_queue.get()
+            if chunk is None:
+                break
+            yield chunk
+
+    async for transcript, is_final, speaker_tag, language_code in session.transcriber.transcribe_stream(audio_generator()):
+        if usage_manager.is_limit_exceeded(user_id):
+             await session.send({"error": "LIMIT_EXCEEDED"})
+             # We should probably stop here, but let's just notify
+        
+        # Context Continuation: Handle interrupted speech
+        current_time = time.time()
+        full_transcript = transcript
+        
+        if is_final and speaker_tag:
+            # Check if this speaker was interrupted recently
+            if speaker_tag in speaker_context:
+                ctx = speaker_context[speaker_tag]
+                time_diff = current_time - ctx["timestamp"]
+                
+                # If within timeout and speaker changed (was interrupted)
+                if time_diff < CONTEXT_TIMEOUT and last_speaker != speaker_tag:
+                    # Concatenate previous fragment
+                    full_transcript = ctx["fragment"] + " " + transcript
+                    print(f"🔗 Context continuation for Speaker {speaker_tag}: '{ctx['fragment']}' + '{transcript}'", flush=True)
+                    # Clear the context since we used it
+                    del speaker_context[speaker_tag]
+            
+            # Update last speaker
+            last_speaker = speaker_tag
+        
+        # Store context for potential interruption (only for final transcripts)
+        if is_final and speaker_tag and len(transcript.strip().split()) >= 3:
+            speaker_context[speaker_tag] = {
+                "fragment": full_transcript,
+                "timestamp": current_time
+            }
+        
+        # Predictive translation: Start translating on interim results with 3+ words
+        word_count = len(full_transcript.strip().split())
+
+        # Final utterances get an id so replies can be requested for them later
+        utterance_id = None
+        if is_final and word_count >= 3:
+            utterance_id = session.smart_replies.add_utterance(full_transcript, speaker_tag)
+        
+        # Send transcript update (use full_transcript with context if available)
+        print(f"📝 Transcript: '{full_transcript}' (final={is_final}, speaker={speaker_tag})", flush=True)
+        await session.send({
+            "type": "transcript",
+            "text": full_transcript,
+            "is_final": is_final,
+            "speaker": speaker_tag,
+            "utterance_id": utterance_id
+        })
+        
+        if word_count >= 3:
+            # Cancel previous interim translation if still running
+            if current_translation_task and not current_translation_task.done() and not is_final:
+                current_translation_task.cancel()
+            
+            # Fix the direction up front (STT language, local model as fallback)
+            source_lang = resolve_language(full_transcript, language_code)
+            target_lang = translation_target(source_lang, session.target_lang)
+
+            async def run_translation_flow(text_to_translate, is_final_translation, source_lang, target_lang):
+                try:
+                    # Already in the listener's language: nothing to translate
+                    if source_lang and source_lang == target_lang:
+                        print(f"DEBUG: Skipping translation, already {target_lang}: {text_to_translate[:50]}...", flush=True)
+                        await session.send({
+                            "type": "translation_only",
+                            "original": text_to_translate,
+                            "translation": text_to_translate,
+                            "language": source_lang,
+                            "skipped": True
+                        })
+                        return
+
+                    print(f"DEBUG: Starting {'FINAL' if is_final_translation else 'INTERIM'} translation ({source_lang or 'auto'}->{target_lang or 'auto'}) for: {text_to_translate[:50]}...", flush=True)
+
+                    try:
+                        trans_res = await assistant.translate_text(text_to_translate, source_lang, target_lang)
+
+                        # Send Translation (buffered for replay if the client is reconnecting)
+                        await session.send({
+                            "type": "translation_only",
+                            "original": text_to_translate,
+                            "translation": trans_res.get("translation", ""),
+                            "language": source_lang or trans_res.get("detected_language")
+                        })
+                    except asyncio.CancelledError:
+                        print(f"DEBUG: Translation cancelled (newer interim arrived)", flush=True)
+                        raise
+                    except Exception as e:
+                        print(f"Parallel execution error: {e}")
+
+                except asyncio.CancelledError:
+                    pass  # Silently ignore cancellation
+                except Exception as e:
+                    print(f"Translation flow error: {e}", flush=True)
+                    import traceback
+                    traceback.print_exc()
+
+            current_translation_task = asyncio.create_task(run_translation_flow(full_transcript, is_final, source_lang, target_lang))
+
+            # Smart replies are on demand; only speculate while the panel is open.
+            # Runs in parallel with the translation to keep latency down.
+            if utterance_id and session.smart_replies.should_prefetch(utterance_id):
+                session.smart_replies.track(asyncio.create_task(send_replies(session, utterance_id)))
+            
+            # For final transcripts, also append to session history
+            if is_final:
+                session.session_transcript.append(full_transcript + " ")
+        else:
+            print(f"DEBUG: Skipping translation for short phrase ({word_count} words)", flush=True)
+
 @app.websocket("/ws/audio")
-async def audio_stream(websocket: WebSocket, user_id: str = Query(..., description="User ID for usage tracking")):
+async def audio_stream(
+    websocket: WebSocket,
+    user_id: str = Query(..., description="User ID for usage tracking"),
+    resume_token: Optional[str] = Query(None, description="Token from a previous session to resume"),
+    last_seq: int = Query(0, description="Last message sequence number the client received"),
+    target_lang: str = Query("auto", description="Listener's language (es/en), or auto for ES<->EN")
+):
     await websocket.accept()
     
     # Check limit immediately
@@ -63,139 +227,33 @@ async def audio_stream(websocket: WebSocket, user_id: str = Query(..., descripti
         await websocket.close()
         return
 
-    usage_manager.start_session(user_id)
-    print(f"Session started for user: {user_id}")
+    # Reattach to a detached session if the token is still alive, otherwise start fresh
+    session = await session_registry.resume(resume_token, user_id) if resume_token else None
+    resumed = session is not None
+    if not resumed:
+        session = session_registry.create(user_id, transcriber_class())
+        session.smart_replies = SmartReplyManager(assistant)
+    session.target_lang = normalize_language(target_lang)
 
-    # Queues for passing data between loops
-    audio_queue = asyncio.Queue()
-    session_transcript = []  # Store full session text
-    
-    async def audio_generator():
-        """Yields audio chunks from the queue."""
-        while True:
-            chunk = await audio_queue.get()
-            if chunk is None:
-                break
-            yield chunk
+    usage_manager.start_session(user_id)
+    print(f"Session {'resumed' if resumed else 'started'} for user: {user_id}")
 
-    transcriber = transcriber_class()
-    
-    # We run the transcription loop as a task
-    transcription_task = None
+    # Close the session for good (instead of keeping it resumable) when the client
+    # stops on purpose or runs out of quota
+    end_session = False
     
     try:
-        # Speaker context for handling interruptions
-        speaker_context = {}  # {speaker_tag: {"fragment": str, "timestamp": float}}
-        CONTEXT_TIMEOUT = 10  # seconds
-        
-        # Start transcription task
-        async def process_transcription():
-            nonlocal speaker_context
-            current_translation_task = None
-            last_speaker = None
-            
-            async for transcript, is_final, speaker_tag in transcriber.transcribe_stream(audio_generator()):
-                if usage_manager.is_limit_exceeded(user_id):
-                     await websocket.send_json({"error": "LIMIT_EXCEEDED"})
-                     # We should probably stop here, but let's just notify
-                
-                # Context Continuation: Handle interrupted speech
-                current_time = time.time()
-                full_transcript = transcript
-                
-                if is_final and speaker_tag:
-                    # Check if this speaker was interrupted recently
-                    if speaker_tag in speaker_context:
-                        ctx = speaker_context[speaker_tag]
-                        time_diff = current_time - ctx["timestamp"]
-                        
-                        # If within timeout and speaker changed (was interrupted)
-                        if time_diff < CONTEXT_TIMEOUT and last_speaker != speaker_tag:
-                            # Concatenate previous fragment
-                            full_transcript = ctx["fragment"] + " " + transcript
-                            print(f"🔗 Context continuation for Speaker {speaker_tag}: '{ctx['fragment']}' + '{transcript}'", flush=True)
-                            # Clear the context since we used it
-                            del speaker_context[speaker_tag]
-                    
-                    # Update last speaker
-                    last_speaker = speaker_tag
-                
-                # Store context for potential interruption (only for final transcripts)
-                if is_final and speaker_tag and len(transcript.strip().split()) >= 3:
-                    speaker_context[speaker_tag] = {
-                        "fragment": full_transcript,
-                        "timestamp": current_time
-                    }
-                
-                # Send transcript update (use full_transcript with context if available)
-                print(f"📝 Transcript: '{full_transcript}' (final={is_final}, speaker={speaker_tag})", flush=True)
-                await websocket.send_json({
-                    "type": "transcript",
-                    "text": full_transcript,
-                    "is_final": is_final,
-                    "speaker": speaker_tag
-                })
-                
-                # Predictive translation: Start translating on interim results with 3+ words
-                word_count = len(full_transcript.strip().split())
-                
-                if word_count >= 3:
-                    # Cancel previous interim translation if still running
-                    if current_translation_task and not current_translation_task.done() and not is_final:
-                        current_translation_task.cancel()
-                    
-                    async def run_translation_flow(text_to_translate, is_final_translation):
-                        try:
-                            print(f"DEBUG: Starting {'FINAL' if is_final_translation else 'INTERIM'} translation for: {text_to_translate[:50]}...", flush=True)
-
-                            # Execute both tasks in parallel to reduce total latency
-                            try:
-                                trans_task = asyncio.create_task(assistant.translate_text(text_to_translate))
-                                
-                                # Only generate replies for final transcripts
-                                if is_final_translation:
-                                    replies_task = asyncio.create_task(assistant.generate_smart_replies(text_to_translate))
-                                    trans_res, replies_res = await asyncio.gather(trans_task, replies_task)
-                                else:
-                                    trans_res = await trans_task
-                                    replies_res = {"replies": []}
-
-                                if websocket.client_state.name == "CONNECTED":
-                                    # Send Translation
-                                    await websocket.send_json({
-                                        "type": "translation_only",
-                                        "original": text_to_translate,
-                                        "translation": trans_res.get("translation", "")
-                                    })
-                                    
-                                    # Send Replies (only for final)
-                                    if is_final_translation:
-                                        await websocket.send_json({
-                                            "type": "replies_only",
-                                            "replies": replies_res.get("replies", [])
-                                        })
-                            except asyncio.CancelledError:
-                                print(f"DEBUG: Translation cancelled (newer interim arrived)", flush=True)
-                                raise
-                            except Exception as e:
-                                print(f"Parallel execution error: {e}")
-
-                        except asyncio.CancelledError:
-                            pass  # Silently ignore cancellation
-                        except Exception as e:
-                            print(f"Translation flow error: {e}", flush=True)
-                            import traceback
-                            traceback.print_exc()
-
-                    current_translation_task = asyncio.create_task(run_translation_flow(full_transcript, is_final))
-                    
-                    # For final transcripts, also append to session history
-                    if is_final:
-                        session_transcript.append(full_transcript + " ")
-                else:
-                    print(f"DEBUG: Skipping translation for short phrase ({word_count} words)", flush=True)
-
-        transcription_task = asyncio.create_task(process_transcription())
+        await websocket.send_json({
+            "type": "session",
+            "resume_token": session.resume_token,
+            "resumed": resumed,
+            "grace_seconds": session_registry.grace_seconds
+        })
+        replayed = await session.attach(websocket, last_seq if resumed else 0)
+        if resumed:
+            print(f"DEBUG: Resumed session for {user_id}, replayed {replayed} messages")
+        else:
+            session.transcription_task = asyncio.create_task(process_transcription(session))
 
         # Main receive loop
         while True:
@@ -209,6 +267,7 @@ async def audio_stream(websocket: WebSocket, user_id: str = Query(..., descripti
             if message["type"] == "websocket.disconnect":
                 logging.info(f"DEBUG: Client disconnected (event): {user_id}")
                 print(f"DEBUG: Client disconnected (event): {user_id}")
+                end_session = message.get("code") in CLEAN_CLOSE_CODES
                 break
             
             # ... (text message handling skipped for brevity if not changing) ...
@@ -222,12 +281,32 @@ async def audio_stream(websocket: WebSocket, user_id: str = Query(..., descripti
                     if data.get("type") == "ping":
                         continue
                     
+                    # Replies panel opened/closed: serve the latest utterance right away
+                    if data.get("type") == "replies_visibility":
+                        replies = session.smart_replies
+                        replies.set_visibility(bool(data.get("visible")))
+                        if replies.visible and replies.latest_other_id:
+                            replies.track(asyncio.create_task(send_replies(session, replies.latest_other_id)))
+                        continue
+
+                    # Client marked which diarization speaker is the user
+                    if data.get("type") == "set_self_speaker":
+                        if data.get("speaker") is not None:
+                            session.smart_replies.set_self_speaker(data.get("speaker"))
+                        continue
+
+                    if data.get("type") == "request_replies":
+                        utterance_id = data.get("utterance_id") or session.smart_replies.latest_other_id
+                        if utterance_id:
+                            session.smart_replies.track(asyncio.create_task(send_replies(session, utterance_id)))
+                        continue
+
                     if data.get("type") == "request_summary":
-                        full_text = "".join(session_transcript)
+                        full_text = "".join(session.session_transcript)
                         logging.debug(f"DEBUG: Generating summary request")
                         print(f"DEBUG: Generating summary for: {full_text[:50]}...")
                         summary_res = await assistant.generate_summary(full_text)
-                        await websocket.send_json({
+                        await session.send({
                             "type": "summary",
                             "summary": summary_res.get("summary", "No summary generated.")
                         })
@@ -246,12 +325,14 @@ async def audio_stream(websocket: WebSocket, user_id: str = Query(..., descripti
             if usage_manager.is_limit_exceeded(user_id):
                  logging.warning(f"LIMIT EXCEEDED for {user_id}")
                  await websocket.send_json({"error": "LIMIT_EXCEEDED"})
+                 end_session = True
                  break
 
-            await audio_queue.put(data)
+            await session.audio_queue.put(data)
 
-    except WebSocketDisconnect:
+    except WebSocketDisconnect as e:
         logging.info(f"Client disconnected: {user_id}")
+        end_session = e.code in CLEAN_CLOSE_CODES
     except Exception as e:
         log_crash(e, context=f"audio_stream user={user_id}")
         logging.error(f"Connection error: {type(e).__name__}: {e}")
@@ -260,7 +341,14 @@ async def audio_stream(websocket: WebSocket, user_id: str = Query(..., descripti
     finally:
         # Cleanup
         logging.info(f"DEBUG: Entering finally block for user: {user_id}")
-        usage_manager.end_session(user_id)
-        await audio_queue.put(None) # Signal generator to stop
-        if transcription_task:
-            await transcription_task 
+        if not session.owned_by(websocket):
+            # A reconnect already resumed this session, its handler owns usage and cleanup
+            logging.info(f"DEBUG: Session for {user_id} taken over by a newer connection")
+        elif end_session:
+            usage_manager.end_session(user_id)
+            await session_registry.close(session)
+        else:
+            # Keep transcriber, transcript and speaker context warm for a reconnect
+            usage_manager.end_session(user_id)
+            logging.info(f"DEBUG: Detaching session for {user_id} ({session_registry.grace_seconds}s grace)")
+            session_registry.detach(session, websocket)
@@ -7,8 +7,9 @@ import logging
 from typing import AsyncGenerator
 from google.cloud import speech
 import google.generativeai as genai
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from cache_manager import translation_cache
+from language_id import LANGUAGE_NAMES
 
 logger = logging.getLogger(__name__)
 
@@ -144,7 +145,7 @@ class Transcriber:
                 if item is None:
                     break
                 if isinstance(item, Exception):
-                    yield f"[Error: {item}]", True, None
+                    yield f"[Error: {item}]", True, None, None
                     break
                 
                 if not item.results:
@@ -163,8 +164,11 @@ class Transcriber:
                     first_word = result.alternatives[0].words[0]
                     if hasattr(first_word, 'speaker_tag'):
                         speaker_tag = first_word.speaker_tag
+
+                # Language STT actually recognized (primary or one of the alternatives)
+                language_code = getattr(result, 'language_code', None) or None
                 
-                yield transcript, is_final, speaker_tag
+                yield transcript, is_final, speaker_tag, language_code
         finally:
             await feeder_task
             thread.join()
@@ -176,9 +180,9 @@ class MockTranscriber:
         async for _ in audio_generator:
             count += 1
             if count % 20 == 0:
-                yield f"Simulated text {count}", True
+                yield f"Simulated text {count}", True, None, "en-us"
             else:
-                yield f"Simulated...", False
+                yield f"Simulated...", False, None, "en-us"
 
 class SmartAssistant:
     """Wraps LLM (Gemini) for Translation and Smart Replies."""
@@ -192,18 +196,34 @@ class SmartAssistant:
             logger.warning("Warning: No Gemini API Key provided.")
             self.active = False
 
-    async def translate_text(self, text: str) -> dict:
-        """Optimized for speed: Only translation with caching."""
+    async def translate_text(self, text: str, source_lang: str = None, target_lang: str = None) -> dict:
+        """Optimized for speed: Only translation with caching.
+
+        With a known direction the prompt skips language detection; otherwise
+        Gemini detects ES/EN and translates to the other one.
+        """
         if not self.active:
             return {"translation": f"[Mock] {text}"}
 
+        source_key = source_lang or "auto"
+        target_key = target_lang or "auto"
+
         # Check cache first
-        cached = translation_cache.get(text)
+        cached = translation_cache.get(text, source_key, target_key)
         if cached:
             logger.debug(f"✅ Cache HIT for: {text[:30]}...")
             return cached
 
-        prompt = f"""
+        if target_lang:
+            # Direction already known: no detection, shorter output
+            source_name = LANGUAGE_NAMES.get(source_lang, "the input")
+            prompt = f"""
+        Task: Translate {source_name} to {LANGUAGE_NAMES[target_lang]}.
+        Input: "{text}"
+        Output JSON: {{"translation": "text"}}
+        """
+        else:
+            prompt = f"""
         Task: Translate (ES<->EN).
         Input: "{text}"
         Output JSON: {{"detected_language": "es|en", "translation": "text"}}
@@ -216,7 +236,7 @@ class SmartAssistant:
         
         # Cache successful translations
         if "translation" in result and not result.get("error"):
-            translation_cache.set(text, result)
+            translation_cache.set(text, result, source_key, target_key)
             logger.debug(f"💾 Cached translation for: {text[:30]}...")
         
         return result
@@ -274,3 +294,111 @@ class SmartAssistant:
             
             logger.error(f"Gemini Error: {e}")
             return default
+
+class ReplyStats:
+    """Smart reply counters across all sessions."""
+    def __init__(self):
+        self.utterances = 0
+        self.calls = 0
+        self.cache_hits = 0
+
+    def get_stats(self) -> dict:
+        """Reply calls made vs. one call per final utterance before."""
+        return {
+            "utterances": self.utterances,
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "calls_avoided": max(self.utterances - self.calls, 0)
+        }
+
+# Global stats instance
+reply_stats = ReplyStats()
+
+class SmartReplyManager:
+    """Demand-driven smart replies for one session.
+
+    Replies are only generated while the client shows the replies panel or asks
+    for a specific utterance. Speculative prefetch is limited to the latest final
+    utterance whose speaker_tag isn't the user's own (as marked by the client),
+    and results are cached per utterance.
+    """
+    def __init__(self, assistant: SmartAssistant, max_utterances: int = 50):
+        self.assistant = assistant
+        self.max_utterances = max_utterances
+        self.visible = False
+        self.self_speaker = None
+        self.latest_other_id = None
+        self._utterances = OrderedDict()  # {utterance_id: {"text": str, "speaker": int}}
+        self._replies = {}  # {utterance_id: asyncio.Task}
+        self._tasks = set()  # Pending send tasks, referenced so they aren't garbage-collected
+        self._next_id = 0
+
+    def set_visibility(self, visible: bool):
+        self.visible = visible
+
+    def set_self_speaker(self, speaker_tag: int):
+        """Mark which diarization speaker is the user; their utterances get no replies."""
+        self.self_speaker = speaker_tag
+        self.latest_other_id = None
+        for utterance_id in reversed(self._utterances):
+            if self._is_other(self._utterances[utterance_id]["speaker"]):
+                self.latest_other_id = utterance_id
+                break
+
+    def add_utterance(self, text: str, speaker_tag: int = None) -> int:
+        """Register a final utterance and return its id."""
+        self._next_id += 1
+        utterance_id = self._next_id
+        self._utterances[utterance_id] = {"text": text, "speaker": speaker_tag}
+        if len(self._utterances) > self.max_utterances:
+            old_id, _ = self._utterances.popitem(last=False)
+            self._replies.pop(old_id, None)
+
+        # Nobody needs replies to their own words
+        if self._is_other(speaker_tag):
+            self.latest_other_id = utterance_id
+        reply_stats.utterances += 1
+        return utterance_id
+
+    def should_prefetch(self, utterance_id: int) -> bool:
+        """Only speculate on the newest utterance from someone else, and only if shown."""
+        return self.visible and utterance_id == self.latest_other_id
+
+    def track(self, task: asyncio.Task) -> asyncio.Task:
+        """Keep a reference to a background task until it finishes."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def cancel_pending(self):
+        """Cancel background sends and in-flight reply calls (session closing)."""
+        for task in list(self._tasks) + list(self._replies.values()):
+            if not task.done():
+                task.cancel()
+        self._tasks.clear()
+        self._replies.clear()
+
+    async def get_replies(self, utterance_id: int) -> dict:
+        """Replies for an utterance, from cache or a (shared) in-flight call."""
+        if utterance_id not in self._utterances:
+            return {"replies": []}
+
+        task = self._replies.get(utterance_id)
+        if task is None:
+            reply_stats.calls += 1
+            text = self._utterances[utterance_id]["text"]
+            task = asyncio.create_task(self.assistant.generate_smart_replies(text))
+            self._replies[utterance_id] = task
+        else:
+            reply_stats.cache_hits += 1
+
+        # Shielded so one cancelled requester doesn't kill the call for the others
+        result = await asyncio.shield(task)
+        # Don't cache failures (quota errors, empty fallbacks), allow a retry
+        if result.get("error") or not result.get("replies"):
+            if self._replies.get(utterance_id) is task:
+                del self._replies[utterance_id]
+        return result
+
+    def _is_other(self, speaker_tag: int) -> bool:
+        return speaker_tag is None or speaker_tag != self.self_speaker
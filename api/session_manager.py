@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import secrets
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 100ms of 16kHz LINEAR16 silence, used to keep the Speech stream alive while detached
+SAMPLE_RATE_HZ = 16000
+SILENCE_FRAME_SECONDS = 0.1
+SILENCE_FRAME = b"\x00\x00" * int(SAMPLE_RATE_HZ * SILENCE_FRAME_SECONDS)
+
+class ResumableSession:
+    """Audio session state that survives a dropped WebSocket."""
+
+    def __init__(self, user_id: str, transcriber, replay_size: int = 200):
+        self.user_id = user_id
+        self.resume_token = secrets.token_urlsafe(24)
+        self.transcriber = transcriber
+        self.audio_queue: asyncio.Queue = asyncio.Queue()
+        self.session_transcript: List[str] = []
+        self.speaker_context: Dict[int, Dict[str, Any]] = {}
+        self.smart_replies = None  # SmartReplyManager, set by the endpoint
+        self.target_lang: Optional[str] = None  # Listener's language ("es"/"en"), None = bidirectional
+        self.transcription_task: Optional[asyncio.Task] = None
+        self.websocket = None
+        self._attaching = None  # Socket being replayed to, not bound yet
+        self.detached_at: Optional[float] = None
+        self.resumes = 0
+        self.closed = False
+        self._seq = 0
+        self._outbox: Deque[Tuple[int, dict]] = deque(maxlen=replay_size)
+        self._gap_task: Optional[asyncio.Task] = None
+        self._expiry_task: Optional[asyncio.Task] = None
+
+    async def send(self, message: dict):
+        """Sequence a message, keep it for replay and deliver it if attached."""
+        self._seq += 1
+        message = {**message, "seq": self._seq}
+        self._outbox.append((self._seq, message))
+
+        websocket = self.websocket
+        if websocket is None:
+            return
+        try:
+            await websocket.send_json(message)
+        except Exception as e:
+            # Kept in the outbox, the client gets it on resume
+            logger.debug(f"DEBUG: Deferred message {self._seq} for {self.user_id}: {e}")
+
+    async def attach(self, websocket, last_seq: int = 0) -> int:
+        """Bind a (new) WebSocket and replay everything after last_seq."""
+        self.cancel_detached_tasks()
+        self.detached_at = None
+        # Claim the session before the first await, so a late detach() from the
+        # previous socket can't start the gap filler and expiry clock again
+        self.websocket = None
+        self._attaching = websocket
+
+        try:
+            # Messages older than the outbox window are lost, tell the client
+            oldest_seq = self._outbox[0][0] if self._outbox else self._seq + 1
+            if last_seq < oldest_seq - 1:
+                await websocket.send_json({
+                    "type": "replay_gap",
+                    "missed_from": last_seq + 1,
+                    "missed_to": oldest_seq - 1
+                })
+
+            replayed = 0
+            # Messages produced while replaying are picked up by the next pass;
+            # the websocket is only bound once nothing is pending, so order holds.
+            while True:
+                pending = [message for seq, message in self._outbox if seq > last_seq]
+                if not pending:
+                    break
+                for message in pending:
+                    await websocket.send_json(message)
+                    last_seq = message["seq"]
+                    replayed += 1
+
+            self.websocket = websocket
+            return replayed
+        finally:
+            if self._attaching is websocket:
+                self._attaching = None
+
+    def owned_by(self, websocket) -> bool:
+        """False once a newer connection has resumed (or is resuming) this session."""
+        return self.websocket in (None, websocket) and self._attaching in (None, websocket)
+
+    def detach(self, websocket, grace_seconds: float, on_expire):
+        """Unbind the WebSocket and keep the session warm for grace_seconds."""
+        if self.closed or not self.owned_by(websocket) or self._expiry_task:
+            # A newer connection already took over this session, or it is already detached
+            return
+        self.websocket = None
+        self.detached_at = time.time()
+        self._gap_task = asyncio.create_task(self._fill_audio_gap())
+        self._expiry_task = asyncio.create_task(self._expire_after(grace_seconds, on_expire))
+
+    async def close(self):
+        """Stop the transcriber and release the session."""
+        if self.closed:
+            return
+        self.closed = True
+        self.websocket = None
+        self.cancel_detached_tasks()
+        if self.smart_replies:
+            self.smart_replies.cancel_pending()
+        await self.audio_queue.put(None)  # Signal generator to stop
+        if self.transcription_task:
+            try:
+                await self.transcription_task
+            except Exception as e:
+                logger.error(f"Transcription task for {self.user_id} failed: {e}")
+
+    async def _fill_audio_gap(self):
+        """Feed silence while no client is attached so the Speech stream neither
+        times out nor waits on a half-spoken utterance."""
+        try:
+            while True:
+                await self.audio_queue.put(SILENCE_FRAME)
+                await asyncio.sleep(SILENCE_FRAME_SECONDS)
+        except asyncio.CancelledError:
+            pass
+
+    async def _expire_after(self, grace_seconds: float, on_expire):
+        try:
+            await asyncio.sleep(grace_seconds)
+        except asyncio.CancelledError:
+            return
+        logger.info(f"Session for {self.user_id} expired after {grace_seconds}s without resume")
+        self._expiry_task = None  # Don't cancel ourselves from close()
+        await on_expire(self)
+
+    def cancel_detached_tasks(self):
+        """Stop the silence filler and expiry clock of a detached session."""
+        for task in (self._gap_task, self._expiry_task):
+            if task and not task.done():
+                task.cancel()
+        self._gap_task = None
+        self._expiry_task = None
+
+class SessionRegistry:
+    """Keeps detached sessions alive so reconnecting clients can resume them."""
+
+    def __init__(self, grace_seconds: float = 30):
+        self.grace_seconds = grace_seconds
+        self._sessions: Dict[str, ResumableSession] = {}
+        self.resumed = 0
+        self.expired = 0
+
+    def create(self, user_id: str, transcriber) -> ResumableSession:
+        session = ResumableSession(user_id, transcriber)
+        self._sessions[session.resume_token] = session
+        return session
+
+    async def resume(self, resume_token: str, user_id: str) -> Optional[ResumableSession]:
+        """Return the live session for this token, if it belongs to user_id."""
+        session = self._sessions.get(resume_token)
+        if session is None or session.closed or session.user_id != user_id:
+            return None
+        if session.transcription_task and session.transcription_task.done():
+            # Transcriber finished or crashed, nothing would read the audio
+            await self.close(session)
+            return None
+        # Stop the expiry clock right away, attaching the new socket awaits
+        session.cancel_detached_tasks()
+        session.resumes += 1
+        self.resumed += 1
+        return session
+
+    def detach(self, session: ResumableSession, websocket):
+        session.detach(websocket, self.grace_seconds, self._expire)
+
+    async def close(self, session: ResumableSession):
+        self._sessions.pop(session.resume_token, None)
+        await session.close()
+
+    async def _expire(self, session: ResumableSession):
+        self.expired += 1
+        await self.close(session)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session statistics."""
+        detached = sum(1 for s in self._sessions.values() if s.detached_at is not None)
+        return {
+            "active": len(self._sessions) - detached,
+            "detached": detached,
+            "resumed": self.resumed,
+            "expired": self.expired,
+            "grace_seconds": self.grace_seconds
+        }
+
+# Global registry instance
+session_registry = SessionRegistry(grace_seconds=float(os.getenv("SESSION_GRACE_SECONDS", "30")))
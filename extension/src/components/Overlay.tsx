@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { X, Mic, MicOff, Loader2, Settings, Square } from 'lucide-react';
 import SettingsPanel from './SettingsPanel';
 import SummaryModal from './SummaryModal';
@@ -14,6 +14,10 @@ interface OverlayProps {
     onUpdateSettings: (settings: Partial<SettingsType>) => void;
     onToggleListening: () => void;
     onReplyClick: (reply: string) => void;
+    onRepliesVisibilityChange: (visible: boolean) => void;
+    lastSpeaker: number | null;
+    selfSpeaker: number | null;
+    onMarkSelfSpeaker: () => void;
     summary: string;
     isSummaryOpen: boolean;
     onRequestSummary: () => void;
@@ -30,6 +34,10 @@ const Overlay: React.FC<OverlayProps> = ({
     onUpdateSettings,
     onToggleListening,
     onReplyClick,
+    onRepliesVisibilityChange,
+    lastSpeaker,
+    selfSpeaker,
+    onMarkSelfSpeaker,
     summary,
     isSummaryOpen,
     onRequestSummary,
@@ -37,6 +45,12 @@ const Overlay: React.FC<OverlayProps> = ({
 }) => {
     const [minimized, setMinimized] = useState(false);
     const [showSettings, setShowSettings] = useState(false);
+    const [showReplies, setShowReplies] = useState(false);
+
+    // Replies are generated on demand, so tell the backend when they can actually be seen
+    useEffect(() => {
+        onRepliesVisibilityChange(showReplies && !minimized);
+    }, [showReplies, minimized]);
 
     // Inline style for rotation animation
     // Inline style for animations
@@ -189,9 +203,23 @@ const Overlay: React.FC<OverlayProps> = ({
                     </div>
 
                     {/* Smart Replies */}
-                    {replies.length > 0 && !isTranslating && (
-                        <div style={{ display: 'flex', flexDirection: 'column', gap: '8px', marginTop: '8px' }}>
-                            <span style={{ fontSize: '10px', textTransform: 'uppercase', color: '#5f6368', fontWeight: 700 }}>Smart Replies</span>
+                    <div style={{ display: 'flex', flexDirection: 'column', gap: '8px', marginTop: '8px' }}>
+                        <button
+                            onClick={() => setShowReplies(!showReplies)}
+                            style={{ background: 'none', border: 'none', padding: 0, cursor: 'pointer', textAlign: 'left', fontSize: '10px', textTransform: 'uppercase', color: '#5f6368', fontWeight: 700 }}
+                        >
+                            {showReplies ? '▾' : '▸'} Smart Replies
+                        </button>
+                        {showReplies && lastSpeaker !== null && (
+                            <button
+                                onClick={onMarkSelfSpeaker}
+                                style={{ background: 'none', border: 'none', padding: 0, cursor: 'pointer', textAlign: 'left', fontSize: '11px', color: '#9aa0a6' }}
+                                title="Smart replies skip what you say yourself"
+                            >
+                                {selfSpeaker === lastSpeaker ? `🙋 You are Speaker ${selfSpeaker}` : `🙋 That was me (Speaker ${lastSpeaker})`}
+                            </button>
+                        )}
+                        {showReplies && replies.length > 0 && !isTranslating && (
                             <div style={{ display: 'flex', flexWrap: 'wrap', gap: '8px' }}>
                                 {replies.map((reply, idx) => (
                                     <button
@@ -213,8 +241,8 @@ const Overlay: React.FC<OverlayProps> = ({
                                     </button>
                                 ))}
                             </div>
-                        </div>
-                    )}
+                        )}
+                    </div>
                 </div>
             </div>
             <SummaryModal
@@ -67,6 +67,31 @@ const SettingsPanel: React.FC<SettingsPanelProps> = ({ settings, onUpdate, onClo
                     </select>
                 </div>
 
+                {/* Target Language */}
+                <div style={{ marginBottom: '20px' }}>
+                    <label style={{ display: 'block', color: '#FFE135', fontSize: '12px', fontWeight: 600, marginBottom: '8px', textTransform: 'uppercase' }}>
+                        Translate To
+                    </label>
+                    <select
+                        value={settings.targetLanguage}
+                        onChange={(e) => onUpdate({ targetLanguage: e.target.value as Settings['targetLanguage'] })}
+                        style={{
+                            width: '100%',
+                            padding: '10px',
+                            background: '#2a2a2a',
+                            border: '1px solid #FFE135',
+                            borderRadius: '8px',
+                            color: '#fff',
+                            fontSize: '14px',
+                            cursor: 'pointer'
+                        }}
+                    >
+                        <option value="auto">🔁 Both ways (ES ↔ EN)</option>
+                        <option value="es">🇪🇸 Español</option>
+                        <option value="en">🇬🇧 English</option>
+                    </select>
+                </div>
+
                 {/* Position */}
                 <div style={{ marginBottom: '20px' }}>
                     <label style={{ display: 'block', color: '#FFE135', fontSize: '12px', fontWeight: 600, marginBottom: '8px', textTransform: 'uppercase' }}>
@@ -28,6 +28,22 @@ const ContentApp: React.FC = () => {
     const streamRef = useRef<MediaStream | null>(null);
     const sourceRef = useRef<MediaStreamAudioSourceNode | null>(null);
 
+    // Session resume state: lets a dropped socket reattach to the same backend session
+    const isListeningRef = useRef(false);
+    const resumeTokenRef = useRef<string | null>(null);
+    const lastSeqRef = useRef(0);
+    const graceSecondsRef = useRef(30);
+    const reconnectAttemptsRef = useRef(0);
+    const reconnectTimerRef = useRef<NodeJS.Timeout | null>(null);
+
+    // Smart replies are on demand: the backend only generates them while the panel is visible
+    const repliesVisibleRef = useRef(false);
+    const repliesUtteranceIdRef = useRef(0);
+    // Diarization speaker the user marked as themselves, so replies skip their own words
+    const [lastSpeaker, setLastSpeaker] = useState<number | null>(null);
+    const [selfSpeaker, setSelfSpeaker] = useState<number | null>(null);
+    const selfSpeakerRef = useRef<number | null>(null);
+
     useEffect(() => {
         const userId = localStorage.getItem('lb_user_id') || `user_${Math.random().toString(36).substr(2, 9)}`;
         localStorage.setItem('lb_user_id', userId);
@@ -50,21 +66,56 @@ const ContentApp: React.FC = () => {
     const setupWebSocket = (): Promise<void> => {
         return new Promise((resolve, reject) => {
             if (wsRef.current) {
-                wsRef.current.close();
+                wsRef.current.close(1000);
             }
 
             const userId = localStorage.getItem('lb_user_id');
-            const wsUrl = `${settings.backendUrl}/ws/audio?user_id=${userId}`;
-            wsRef.current = new WebSocket(wsUrl);
+            let wsUrl = `${settings.backendUrl}/ws/audio?user_id=${userId}&target_lang=${settings.targetLanguage}`;
+            if (resumeTokenRef.current) {
+                wsUrl += `&resume_token=${encodeURIComponent(resumeTokenRef.current)}&last_seq=${lastSeqRef.current}`;
+            }
+            const ws = new WebSocket(wsUrl);
+            wsRef.current = ws;
 
-            wsRef.current.onopen = () => {
+            ws.onopen = () => {
                 console.log('✅ WebSocket OPEN - Ready to send audio');
+                reconnectAttemptsRef.current = 0;
                 resolve();
             };
 
-            wsRef.current.onmessage = (event) => {
+            ws.onmessage = (event) => {
                 const data = JSON.parse(event.data);
 
+                if (data.type === 'session') {
+                    if (!data.resumed) {
+                        // Server started a fresh session, old sequence numbers no longer apply
+                        lastSeqRef.current = 0;
+                        repliesUtteranceIdRef.current = 0;
+                    }
+                    resumeTokenRef.current = data.resume_token;
+                    graceSecondsRef.current = data.grace_seconds ?? graceSecondsRef.current;
+                    console.log(data.resumed ? '🔁 Session resumed' : '🆕 Session started');
+                    // A fresh session doesn't know the panel state yet
+                    ws.send(JSON.stringify({ type: 'replies_visibility', visible: repliesVisibleRef.current }));
+                    if (selfSpeakerRef.current !== null) {
+                        ws.send(JSON.stringify({ type: 'set_self_speaker', speaker: selfSpeakerRef.current }));
+                    }
+                    return;
+                }
+
+                if (data.type === 'replay_gap') {
+                    // Backend no longer had everything we missed; newer messages still follow
+                    console.warn(`⚠️ Missed messages ${data.missed_from}-${data.missed_to} during reconnect`);
+                    lastSeqRef.current = Math.max(lastSeqRef.current, data.missed_to);
+                    return;
+                }
+
+                // Skip messages already received before a reconnect
+                if (typeof data.seq === 'number') {
+                    if (data.seq <= lastSeqRef.current) return;
+                    lastSeqRef.current = data.seq;
+                }
+
                 if (data.error) {
                     setTranscript(`Error: ${data.message || data.error}`);
                     if (data.error === 'LIMIT_EXCEEDED') {
@@ -77,6 +128,9 @@ const ContentApp: React.FC = () => {
                     setTranscript(data.text);
                     if (data.is_final) {
                         setIsTranslating(true);
+                        if (typeof data.speaker === 'number') {
+                            setLastSpeaker(data.speaker);
+                        }
                     }
                 } else if (data.type === 'translation') {
                     setTranslation(data.translation);
@@ -95,6 +149,11 @@ const ContentApp: React.FC = () => {
                     if (data.replies && data.replies.error === 'QUOTA_EXCEEDED') {
                         return;
                     }
+                    // Don't let a late reply for an older utterance replace newer ones
+                    if (typeof data.utterance_id === 'number') {
+                        if (data.utterance_id < repliesUtteranceIdRef.current) return;
+                        repliesUtteranceIdRef.current = data.utterance_id;
+                    }
                     setReplies(data.replies || []);
                 } else if (data.type === 'summary') {
                     setSummary(data.summary);
@@ -103,24 +162,53 @@ const ContentApp: React.FC = () => {
                 }
             };
 
-            wsRef.current.onerror = (err) => {
+            ws.onerror = (err) => {
                 console.error('WebSocket Error:', err);
                 reject(err);
             };
 
-            wsRef.current.onclose = (event) => {
+            ws.onclose = (event) => {
                 console.log("WebSocket Closed:", event.code, event.reason);
+                // Ignore sockets we replaced or closed ourselves
+                if (wsRef.current !== ws) return;
+
                 // Only show error for abnormal closures (not 1000 normal, not 1005 no status)
                 if (event.code !== 1000 && event.code !== 1005) {
+                    if (isListeningRef.current && scheduleReconnect()) {
+                        return;
+                    }
                     setTranscript(`❌ Disconnected: Code ${event.code} - ${event.reason || "Unknown error"}`);
                 }
-                setIsListening(false);
+                stopListening();
             };
 
             setTimeout(() => reject(new Error("WebSocket connection timeout")), 5000);
         });
     };
 
+    const scheduleReconnect = (): boolean => {
+        // Backoff 250ms, 500ms, 1s, 2s... and give up once the server grace period is spent
+        const attempt = reconnectAttemptsRef.current;
+        const delay = Math.min(250 * 2 ** attempt, 4000);
+        const spent = Array.from({ length: attempt }, (_, i) => Math.min(250 * 2 ** i, 4000)).reduce((a, b) => a + b, 0);
+        if (!resumeTokenRef.current || spent + delay > graceSecondsRef.current * 1000) {
+            return false;
+        }
+
+        reconnectAttemptsRef.current = attempt + 1;
+        setTranscript('🔄 Reconnecting...');
+        reconnectTimerRef.current = setTimeout(async () => {
+            reconnectTimerRef.current = null;
+            if (!isListeningRef.current) return;
+            try {
+                await setupWebSocket();
+            } catch (err) {
+                console.error('Reconnect failed:', err);
+            }
+        }, delay);
+        return true;
+    };
+
     const downsampleBuffer = (buffer: Float32Array, sampleRate: number, outSampleRate: number) => {
         if (outSampleRate === sampleRate) {
             return buffer;
@@ -157,6 +245,11 @@ const ContentApp: React.FC = () => {
     const startListening = async () => {
         try {
             setIsListening(true);
+            isListeningRef.current = true;
+            resumeTokenRef.current = null;
+            lastSeqRef.current = 0;
+            reconnectAttemptsRef.current = 0;
+            repliesUtteranceIdRef.current = 0;
             console.log("🔌 Connecting WebSocket...");
             await setupWebSocket();
             console.log("🎤 WebSocket ready, starting audio capture...");
@@ -234,13 +327,18 @@ const ContentApp: React.FC = () => {
 
         } catch (err) {
             console.error('❌ Error in startListening:', err);
-            setIsListening(false);
-            if (wsRef.current) wsRef.current.close();
+            stopListening();
         }
     };
 
     const stopListening = () => {
         setIsListening(false);
+        isListeningRef.current = false;
+
+        if (reconnectTimerRef.current) {
+            clearTimeout(reconnectTimerRef.current);
+            reconnectTimerRef.current = null;
+        }
 
         if (processorRef.current && processorRef.current._monitorInterval) {
             clearInterval(processorRef.current._monitorInterval);
@@ -254,8 +352,10 @@ const ContentApp: React.FC = () => {
             // Do NOT close here if we want to receive the summary, but user requested stop.
             // Actually, for now, we close it, but if requesting summary we might need it open.
             // Let's rely on handleRequestSummary to handle the flow.
-            wsRef.current.close();
+            // 1000 tells the server the session is over, so it is not kept for resume
+            const ws = wsRef.current;
             wsRef.current = null;
+            ws.close(1000);
         }
 
         sourceRef.current = null;
@@ -274,6 +374,22 @@ const ContentApp: React.FC = () => {
         // alert(`Copied: "${reply}"`); // Removed alert for smoother UX
     };
 
+    const handleRepliesVisibilityChange = (visible: boolean) => {
+        repliesVisibleRef.current = visible;
+        if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+            wsRef.current.send(JSON.stringify({ type: 'replies_visibility', visible }));
+        }
+    };
+
+    const handleMarkSelfSpeaker = () => {
+        if (lastSpeaker === null) return;
+        setSelfSpeaker(lastSpeaker);
+        selfSpeakerRef.current = lastSpeaker;
+        if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+            wsRef.current.send(JSON.stringify({ type: 'set_self_speaker', speaker: lastSpeaker }));
+        }
+    };
+
     const handleRequestSummary = () => {
         if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
             wsRef.current.send(JSON.stringify({ type: 'request_summary' }));
@@ -293,6 +409,10 @@ const ContentApp: React.FC = () => {
             onUpdateSettings={updateSettings}
             onToggleListening={toggleListening}
             onReplyClick={handleReplyClick}
+            onRepliesVisibilityChange={handleRepliesVisibilityChange}
+            lastSpeaker={lastSpeaker}
+            selfSpeaker={selfSpeaker}
+            onMarkSelfSpeaker={handleMarkSelfSpeaker}
             summary={summary}
             isSummaryOpen={isSummaryOpen}
             onRequestSummary={handleRequestSummary}
@@ -2,12 +2,14 @@ import { useState, useEffect } from 'react';
 
 export interface Settings {
     language: 'es-ES' | 'en-US' | 'auto';
+    targetLanguage: 'es' | 'en' | 'auto';
     position: 'bottom-right' | 'bottom-left' | 'top-right' | 'top-left';
     backendUrl: string;
 }
 
 const DEFAULT_SETTINGS: Settings = {
     language: 'auto',
+    targetLanguage: 'auto',
     position: 'bottom-right',
     backendUrl: 'ws://localhost:8000'
 };